@@ -1,6 +1,8 @@
 """Configuration and environment loading."""
 
+import functools
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,7 +14,11 @@ class Config:
     
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    DEBUG = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+    
+    # Maximum request body size in bytes; chat messages are capped at 1000
+    # characters and quiz payloads are small, so anything larger is rejected
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024))
     
     # Google Gemini API Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -21,8 +27,9 @@ class Config:
     FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH')
     
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def validate_config(cls):
-        """Validate required environment variables and credential path."""
+        """Validate required environment variables and credential path (once; failures are not cached)."""
         required_vars = [
             ('GEMINI_API_KEY', cls.GEMINI_API_KEY),
             ('FIREBASE_CREDENTIALS_PATH', cls.FIREBASE_CREDENTIALS_PATH)
@@ -40,7 +47,7 @@ class Config:
             )
         
         # Check if Firebase credentials file exists
-        if not os.path.exists(cls.FIREBASE_CREDENTIALS_PATH):
+        if not Path(cls.FIREBASE_CREDENTIALS_PATH).is_file():
             raise ValueError(
                 f"Firebase credentials file not found at: {cls.FIREBASE_CREDENTIALS_PATH}. "
                 "Please ensure the file exists and the path is correct."
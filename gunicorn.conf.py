@@ -0,0 +1,21 @@
+"""Gunicorn settings for production: gunicorn -c gunicorn.conf.py run:app"""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Requests mostly wait on Firestore and Gemini, so each worker serves them
+# from a pool of threads rather than one at a time
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+# Chat sessions live in process memory, so a client must keep hitting the
+# same worker. Keep a single worker unless the load balancer pins users to one.
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# Gemini replies can take a while; the chat call itself gives up after 30s
+timeout = 60
+keepalive = 5
+
+# Each worker initializes Firebase and Gemini itself after the fork
+preload_app = False
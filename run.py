@@ -1,6 +1,6 @@
 """Local development entry point."""
 
-from stressease import create_app
+from stressease import create_app, preload_services
 from config import Config
 
 # Validate configuration before starting the application
@@ -11,6 +11,9 @@ except ValueError as e:
     print(f"[ERROR] Configuration error: {e}")
     exit(1)
 
+# Initialize Firebase and Gemini before serving any requests
+preload_services()
+
 # Create the Flask application instance
 app = create_app()
 
@@ -1,7 +1,131 @@
 """Flask app factory. Registers blueprints and initializes services."""
 
-from flask import Flask, jsonify
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+from flask import Flask, request, abort
 from config import Config
+from stressease.json_provider import OrjsonProvider, to_json_bytes, json_bytes_response
+
+
+logger = logging.getLogger(__name__)
+
+# Static bodies for /health and /api, serialized once at import
+_HEALTH_BODY = to_json_bytes({
+    'status': 'healthy',
+    'message': 'StressEase Backend API is running'
+})
+
+_API_ROOT_BODY = to_json_bytes({
+    'message': 'Welcome to StressEase Backend API',
+    'version': '1.0.0',
+    'endpoints': {
+        'mood': '/api/mood',
+        'chat': '/api/chat'
+    }
+})
+
+# Global error bodies by status code, serialized once at import
+_ERROR_BODIES = {
+    400: to_json_bytes({
+        'error': 'Bad Request',
+        'message': 'The request could not be understood by the server'
+    }),
+    401: to_json_bytes({
+        'error': 'Unauthorized',
+        'message': 'Authentication required'
+    }),
+    403: to_json_bytes({
+        'error': 'Forbidden',
+        'message': 'Access denied'
+    }),
+    404: to_json_bytes({
+        'error': 'Not Found',
+        'message': 'The requested resource was not found'
+    }),
+    413: to_json_bytes({
+        'error': 'Payload Too Large',
+        'message': 'The request body exceeds the allowed size'
+    }),
+    500: to_json_bytes({
+        'error': 'Internal Server Error',
+        'message': 'An unexpected error occurred'
+    }),
+}
+
+
+def _handle_http_error(error):
+    """Serve the pre-serialized JSON body for an HTTP error status."""
+    return json_bytes_response(_ERROR_BODIES[error.code], error.code)
+
+
+# stressease.* log records are queued by the calling thread and written to
+# stderr by a listener thread, so request threads never block on the stream
+_log_listener = None
+
+
+def _configure_logging():
+    """Attach the queue-backed handler to the stressease logger, once per process."""
+    global _log_listener
+    
+    if _log_listener is not None:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    
+    logger = logging.getLogger('stressease')
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+    
+    _log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+
+# Services are initialized once per process, on first use
+_ENDPOINTS_WITHOUT_SERVICES = frozenset({'health_check', 'api_root'})
+_services_lock = threading.Lock()
+_services_initialized = False
+
+
+def preload_services():
+    """
+    Initialize Firebase and Gemini exactly once per process.
+    
+    Entry points call this before create_app() so the SDK handshakes happen
+    at startup; otherwise it runs on the first request. Repeat calls are no-ops.
+    """
+    global _services_initialized
+    
+    if _services_initialized:
+        return
+    
+    with _services_lock:
+        if _services_initialized:
+            return
+        
+        _configure_logging()
+        
+        from stressease.services.firebase_service import init_firebase
+        from stressease.services.gemini_service import init_gemini
+        
+        try:
+            # Initialize Firebase
+            init_firebase(Config.FIREBASE_CREDENTIALS_PATH)
+            
+            # Initialize Gemini AI
+            init_gemini(Config.GEMINI_API_KEY)
+            
+        except Exception as e:
+            logger.error("Service initialization error: %s", e)
+            raise
+        
+        _services_initialized = True
 
 
 def create_app():
@@ -17,22 +141,26 @@ def create_app():
     # Load configuration
     app.config.from_object(Config)
     
-    # Initialize services
-    from stressease.services.firebase_service import init_firebase
-    from stressease.services.gemini_service import init_gemini
+    # Route service logging through a background writer
+    _configure_logging()
     
-    try:
-        # Initialize Firebase
-        init_firebase(Config.FIREBASE_CREDENTIALS_PATH)
-        print("✓ Firebase initialized successfully")
-        
-        # Initialize Gemini AI
-        init_gemini(Config.GEMINI_API_KEY)
-        print("✓ Gemini AI initialized successfully")
-        
-    except Exception as e:
-        print(f"✗ Service initialization error: {e}")
-        raise
+    # Serialize JSON with orjson
+    app.json = OrjsonProvider(app)
+    
+    # Reject oversized bodies from the Content-Length header, before any
+    # view reads or parses them
+    @app.before_request
+    def reject_oversized_body():
+        if (request.content_length or 0) > app.config['MAX_CONTENT_LENGTH']:
+            abort(413)
+    
+    # Initialize services on the first request that needs them, so creating
+    # the app, static endpoints and unknown URLs (endpoint None) don't wait on
+    # SDK handshakes or fail when they do
+    @app.before_request
+    def ensure_services():
+        if request.endpoint is not None and request.endpoint not in _ENDPOINTS_WITHOUT_SERVICES:
+            preload_services()
     
     # Register blueprints
     from stressease.api.mood import mood_bp
@@ -49,64 +177,22 @@ def create_app():
             
             # Initialize debug tools with reference to active sessions
             init_debug_tools(app, active_chat_sessions)
-            print("✓ Debug tools initialized (DEVELOPMENT ONLY)")
+            logger.info("Debug tools initialized (DEVELOPMENT ONLY)")
         except Exception as e:
-            print(f"✗ Debug tools initialization error: {e}")
+            logger.warning("Debug tools initialization error: %s", e)
     
     # Global error handlers
-    @app.errorhandler(400)
-    def bad_request(error):
-        return jsonify({
-            'error': 'Bad Request',
-            'message': 'The request could not be understood by the server'
-        }), 400
-    
-    @app.errorhandler(401)
-    def unauthorized(error):
-        return jsonify({
-            'error': 'Unauthorized',
-            'message': 'Authentication required'
-        }), 401
-    
-    @app.errorhandler(403)
-    def forbidden(error):
-        return jsonify({
-            'error': 'Forbidden',
-            'message': 'Access denied'
-        }), 403
-    
-    @app.errorhandler(404)
-    def not_found(error):
-        return jsonify({
-            'error': 'Not Found',
-            'message': 'The requested resource was not found'
-        }), 404
-    
-    @app.errorhandler(500)
-    def internal_error(error):
-        return jsonify({
-            'error': 'Internal Server Error',
-            'message': 'An unexpected error occurred'
-        }), 500
+    for code in _ERROR_BODIES:
+        app.register_error_handler(code, _handle_http_error)
     
     # Health check endpoint
     @app.route('/health')
     def health_check():
-        return jsonify({
-            'status': 'healthy',
-            'message': 'StressEase Backend API is running'
-        }), 200
+        return json_bytes_response(_HEALTH_BODY, 200)
     
     # API root endpoint
     @app.route('/api')
     def api_root():
-        return jsonify({
-            'message': 'Welcome to StressEase Backend API',
-            'version': '1.0.0',
-            'endpoints': {
-                'mood': '/api/mood',
-                'chat': '/api/chat'
-            }
-        }), 200
+        return json_bytes_response(_API_ROOT_BODY, 200)
     
     return app
\ No newline at end of file
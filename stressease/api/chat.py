@@ -6,19 +6,69 @@ from stressease.services.gemini_service import (
     generate_chat_response, start_chat_session, find_crisis_resources
 )
 from stressease.services.firebase_service import (
-    get_cached_crisis_resources, cache_crisis_resources
+    get_cached_crisis_resources, cache_crisis_resources, normalize_country_id
 )
-from datetime import datetime
-import uuid
+from stressease.json_provider import to_json_bytes, json_bytes_response
+from cachetools import TTLCache
+import secrets
+import threading
+import time
 
 # Create the chat blueprint
 chat_bp = Blueprint('chat', __name__)
 
+# Static validation error bodies, serialized once at import
+_ERR_JSON_REQUIRED = to_json_bytes({
+    'success': False,
+    'error': 'Invalid request',
+    'message': 'JSON data is required'
+})
+_ERR_EMPTY_MESSAGE = to_json_bytes({
+    'success': False,
+    'error': 'Invalid message',
+    'message': 'Message cannot be empty'
+})
+_ERR_MESSAGE_TOO_LONG = to_json_bytes({
+    'success': False,
+    'error': 'Message too long',
+    'message': 'Message must be 1000 characters or less'
+})
+_ERR_SESSION_NOT_FOUND = to_json_bytes({
+    'success': False,
+    'error': 'Session not found',
+    'message': 'Chat session has expired or does not exist'
+})
+_ERR_SESSION_ID_INVALID = to_json_bytes({
+    'success': False,
+    'error': 'Invalid session_id',
+    'message': 'session_id must be a string or null'
+})
+_ERR_SESSION_ID_REQUIRED = to_json_bytes({
+    'success': False,
+    'error': 'Missing session_id',
+    'message': 'session_id is required'
+})
+
+
+# (epoch second, formatted 'YYYY-MM-DDTHH:MM:SS') from the last _iso_now() call;
+# replaced as one tuple so concurrent readers never see a mismatched pair
+_iso_second_prefix = (None, '')
+
+
+def _iso_now():
+    """Current UTC time as an ISO 8601 string with microseconds, without a datetime object."""
+    global _iso_second_prefix
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    cached_second, prefix = _iso_second_prefix
+    if cached_second != seconds:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+        _iso_second_prefix = (seconds, prefix)
+    return f"{prefix}.{nanos // 1000:06d}"
+
 #------------------------------------------------------------------------------
 # CRISIS SUPPORT ENDPOINTS
 #------------------------------------------------------------------------------
 
-
 @chat_bp.route('/crisis-resources', methods=['GET' , 'POST'])
 @token_required
 def get_crisis_resources(user_id):
@@ -33,63 +83,62 @@ def get_crisis_resources(user_id):
         JSON response with country-specific crisis resources
     """
     try:
-        # Get country from query parameter - Android app sends from dropdown
-        country = request.args.get('country', '').strip()
+        # Get country from query parameter - Android app sends from dropdown.
+        # Normalized once so case/spacing variants share one cache entry
+        country = normalize_country_id(request.args.get('country', ''))
         
         # Set default country if somehow not provided (fallback only)
         if not country:
             country = 'India'
         
-        # Step 1: Check cache first
+        # Step 1: Check cache (in-process first, then Firebase)
         cached_resources = get_cached_crisis_resources(country)
         
         # Step 2: Cache hit - return cached resources
         if cached_resources:
-            response = jsonify({
+            return jsonify({
                 'success': True,
                 'message': 'Crisis resources retrieved from cache',
                 'resources': cached_resources,
                 'source': 'cache'
-            })
-            response.headers['Content-Type'] = 'application/json; charset=utf-8'
-            return response, 200
+            }), 200
         
         # Step 3: Cache miss - generate new resources using Gemini
         resources = find_crisis_resources(country)
         if not resources:
-            response = jsonify({
+            return jsonify({
                 'success': False,
                 'message': f'Could not find Crisis resources for {country}'
-            })
-            response.headers['Content-Type'] = 'application/json; charset=utf-8'
-            return response, 404
+            }), 404
         
-        # Step 4: Cache the new resources in Firebase
+        # Step 4: Cache the new resources
         cache_success = cache_crisis_resources(country, resources)
         
         # Step 5: Return the resources
-        response = jsonify({
+        return jsonify({
             'success': True,
             'message': 'Crisis resources generated using AI',
             'resources': resources,
             'source': 'generated',
             'cached': cache_success
-        })
-        response.headers['Content-Type'] = 'application/json; charset=utf-8'
-        return response, 200
+        }), 200
         
     except Exception as e:
-        response = jsonify({
+        return jsonify({
             'success': False,
             'message': f'Error retrieving crisis resources: {str(e)}'
-        })
-        response.headers['Content-Type'] = 'application/json; charset=utf-8'
-        return response, 500
+        }), 500
 
 
-# Dictionary to store active chat sessions by user_id
+# Bounded cache of active chat sessions by user_id; users idle for longer
+# than the TTL are evicted so abandoned sessions don't accumulate
 # Format: {user_id: {session_id: chat_session}}
-active_chat_sessions = {}
+SESSION_CACHE_MAX_USERS = 10000
+SESSION_IDLE_TTL_SECONDS = 1800
+active_chat_sessions = TTLCache(maxsize=SESSION_CACHE_MAX_USERS, ttl=SESSION_IDLE_TTL_SECONDS)
+
+# TTLCache is not thread-safe; guards every access from threaded workers
+_sessions_lock = threading.Lock()
 
 
 # Endpoint: POST /api/chat/message
@@ -111,72 +160,71 @@ def send_chat_message(user_id):
     Returns:
         JSON response with AI reply and session_id for local storage
     """
+    # Get and validate JSON data
+    message_data = request.get_json(cache=False, silent=True)
+    if not message_data or not isinstance(message_data, dict):
+        return json_bytes_response(_ERR_JSON_REQUIRED, 400)
+    
+    # Extract and validate message
+    user_message = message_data.get('message')
+    session_id = message_data.get('session_id')
+    
+    # Input validation - optimized with early returns
+    if not isinstance(user_message, str) or not user_message.strip():
+        return json_bytes_response(_ERR_EMPTY_MESSAGE, 400)
+    user_message = user_message.strip()
+    
+    if len(user_message) > 1000:
+        return json_bytes_response(_ERR_MESSAGE_TOO_LONG, 400)
+    
+    if session_id is not None and not isinstance(session_id, str):
+        return json_bytes_response(_ERR_SESSION_ID_INVALID, 400)
+    
+    # Create timestamp once for efficiency
+    timestamp = _iso_now()
+    
+    # Get or create session with user_id to maintain context; this is the
+    # only step that can raise (e.g. Gemini not initialized)
     try:
-        # Get and validate JSON data
-        message_data = request.get_json()
-        if not message_data:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid request',
-                'message': 'JSON data is required'
-            }), 400
-        
-        # Extract and validate message
-        user_message = message_data.get('message', '').strip()
-        session_id = message_data.get('session_id')
-        
-        # Input validation - optimized with early returns
-        if not user_message:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid message',
-                'message': 'Message cannot be empty'
-            }), 400
-        
-        if len(user_message) > 1000:
-            return jsonify({
-                'success': False,
-                'error': 'Message too long',
-                'message': 'Message must be 1000 characters or less'
-            }), 400
-        
-        # Create timestamp once for efficiency
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Get or create session with user_id to maintain context
         session_id, chat_session = _get_or_create_session(session_id, user_id)
-        if not chat_session:
-            return jsonify({
-                'success': False,
-                'error': 'Session not found',
-                'message': 'Chat session has expired or does not exist'
-            }), 404
-        
-        # Generate AI response (validation is already done inside generate_chat_response)
-        ai_response = generate_chat_response(chat_session, user_message)
-        
-        # Return standard response structure
-        return jsonify({
-            'success': True,
-            'user_message': {
-                'content': user_message,
-                'timestamp': timestamp,
-                'role': 'user'
-            },
-            'ai_response': {
-                'content': ai_response,
-                'timestamp': timestamp,
-                'role': 'assistant'
-            },
-            'session_id': session_id
-        }), 201
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': 'Failed to process message',
             'message': str(e)
         }), 500
+    
+    if not chat_session:
+        return json_bytes_response(_ERR_SESSION_NOT_FOUND, 404)
+    
+    # If a timed-out Gemini call is still running, the session's history can no
+    # longer be trusted: it is discarded and no session_id is handed back, so
+    # the client's next message starts a new session
+    session_retired = False
+    
+    def retire_session():
+        nonlocal session_retired
+        _discard_session(user_id, session_id)
+        session_retired = True
+    
+    # Generate AI response (validation and error fallbacks are handled inside generate_chat_response)
+    ai_response = generate_chat_response(chat_session, user_message, on_timeout=retire_session)
+    
+    # Return standard response structure
+    return jsonify({
+        'success': True,
+        'user_message': {
+            'content': user_message,
+            'timestamp': timestamp,
+            'role': 'user'
+        },
+        'ai_response': {
+            'content': ai_response,
+            'timestamp': timestamp,
+            'role': 'assistant'
+        },
+        'session_id': None if session_retired else session_id
+    }), 201
 
 
 def _get_or_create_session(session_id, user_id):
@@ -189,40 +237,49 @@ def _get_or_create_session(session_id, user_id):
         user_id (str): User ID from authentication
         
     Returns:
-        tuple: (session_id, chat_session) or (None, None) if failed
+        tuple: (session_id, chat_session) or (None, None) if the session was not found
+        
+    Raises:
+        RuntimeError: If a new session is needed and Gemini hasn't been initialized
     """
-    try:
-        # Initialize user's session dictionary if it doesn't exist
-        if user_id not in active_chat_sessions:
-            active_chat_sessions[user_id] = {}
+    with _sessions_lock:
+        # Initialize user's session dictionary if it doesn't exist;
+        # re-inserting it on every access restarts the idle TTL
+        user_sessions = active_chat_sessions.get(user_id, {})
+        active_chat_sessions[user_id] = user_sessions
         
-        # If no session_id provided, check if user has any active sessions
-        if not session_id:
-            # If user has active sessions, use the most recent one
-            if active_chat_sessions[user_id]:
-                # Get the first session (assuming it's the most recent)
-                # In a production app, you might want to track timestamps
-                session_id = next(iter(active_chat_sessions[user_id]))
-                return session_id, active_chat_sessions[user_id][session_id]
-            
-            # No active sessions, create a new one
-            session_id = str(uuid.uuid4())
-            chat_session = start_chat_session({})
-            active_chat_sessions[user_id][session_id] = chat_session
+        # Existing session: a single lookup for this user
+        if session_id:
+            chat_session = user_sessions.get(session_id)
+            if chat_session is None:
+                return None, None
             return session_id, chat_session
         
-        # Check if the specific session exists for this user
-        if session_id in active_chat_sessions[user_id]:
-            return session_id, active_chat_sessions[user_id][session_id]
-        
-        # Session not found for this user
-        return None, None
-        
-    except Exception:
-        return None, None
-
+        # If user has active sessions, use the most recent one
+        if user_sessions:
+            # Get the first session (assuming it's the most recent)
+            # In a production app, you might want to track timestamps
+            return next(iter(user_sessions.items()))
+    
+    # No active sessions, create a new one; built outside the lock so other
+    # users' lookups never wait on the Gemini SDK
+    chat_session = start_chat_session({})
+    session_id = secrets.token_urlsafe(18)
+    
+    with _sessions_lock:
+        # The user's entry may have expired while the session was built
+        user_sessions = active_chat_sessions.get(user_id, {})
+        active_chat_sessions[user_id] = user_sessions
+        user_sessions[session_id] = chat_session
+    return session_id, chat_session
 
 
+def _discard_session(user_id, session_id):
+    """Remove a session from the cache; later messages for it get a 404."""
+    with _sessions_lock:
+        user_sessions = active_chat_sessions.get(user_id)
+        if user_sessions:
+            user_sessions.pop(session_id, None)
 
 
 # Endpoint: POST /api/chat/end-session
@@ -236,50 +293,31 @@ def end_chat_session(user_id):
     
     Expected JSON payload:
     {
-        "session_id": "a1b2c3d4-e5f6-g7h8-i9j0-k1l2m3n4o5p6"
+        "session_id": "q3Zc8b1xT0yKf2LmN7pR4wXa"
     }
     
     Returns:
         JSON response confirming session cleanup
     """
-    try:
-        # Get and validate JSON data
-        request_data = request.get_json()
-        if not request_data:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid request',
-                'message': 'JSON data is required'
-            }), 400
-        
-        # Extract and validate session_id
-        session_id = request_data.get('session_id', '').strip()
-        if not session_id:
-            return jsonify({
-                'success': False,
-                'error': 'Missing session_id',
-                'message': 'session_id is required'
-            }), 400
-        
-        # Optimized cleanup - batch operations
-        cleanup_count = 0
-        
-        # Clean up active session from memory cache
-        if user_id in active_chat_sessions and session_id in active_chat_sessions[user_id]:
-            del active_chat_sessions[user_id][session_id]
-            cleanup_count += 1
-            
-            
-        return jsonify({
-            'success': True,
-            'message': 'Session ended successfully',
-            'cleanup_count': cleanup_count
-        }), 200
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': 'Failed to end session',
-            'message': str(e)
-        }), 500
+    # Get and validate JSON data
+    request_data = request.get_json(cache=False, silent=True)
+    if not request_data or not isinstance(request_data, dict):
+        return json_bytes_response(_ERR_JSON_REQUIRED, 400)
+    
+    # Extract and validate session_id
+    session_id = request_data.get('session_id')
+    if not isinstance(session_id, str) or not session_id.strip():
+        return json_bytes_response(_ERR_SESSION_ID_REQUIRED, 400)
+    session_id = session_id.strip()
+    
+    # Clean up active session from memory cache with a single lookup
+    with _sessions_lock:
+        user_sessions = active_chat_sessions.get(user_id)
+        removed = user_sessions.pop(session_id, None) if user_sessions else None
+    
+    return jsonify({
+        'success': True,
+        'message': 'Session ended successfully',
+        'cleanup_count': 0 if removed is None else 1
+    }), 200
 
@@ -6,15 +6,85 @@ from stressease.services.firebase_service import (
     save_daily_mood_log,
     get_last_daily_mood_logs,
     get_daily_mood_logs_count,
-    weekly_dass_exists,
     save_weekly_dass_totals,
 )
+from stressease.json_provider import to_json_bytes, json_bytes_response
 from datetime import datetime, date
 
 # Create the mood blueprint
 mood_bp = Blueprint('mood', __name__)
 
+# Score keys per section, in question order (q1-q4 core, q10-q12 DASS)
+CORE_KEYS = ('mood', 'energy', 'sleep', 'stress')
+DASS_KEYS = ('depression', 'anxiety', 'stress')
+ROTATING_SCORE_COUNT = 5
+_REQUIRED_CORE_KEYS = frozenset(CORE_KEYS)
+_REQUIRED_DASS_KEYS = frozenset(DASS_KEYS)
 
+# Fields of the stored daily logs read by the weekly aggregation
+_WEEKLY_FIELDS = ['date', 'submitted_at', 'dass_today', 'core_scores', 'rotating_scores.scores']
+
+# Daily DASS answer (1-5) to DASS-21 item score (0-3), indexed by answer
+_DASS_SCALE = (0, 0, 1, 1, 2, 3)
+
+# Static error bodies, serialized once at import
+_ERR_JSON_REQUIRED = to_json_bytes({
+    'success': False,
+    'error': 'Invalid request',
+    'message': 'JSON body required'
+})
+_ERR_MISSING_SECTIONS = to_json_bytes({
+    'success': False,
+    'error': 'Missing required fields',
+    'message': 'core_scores, rotating_scores, and dass_today are required'
+})
+_ERR_CORE_KEYS = to_json_bytes({
+    'success': False,
+    'error': 'Invalid core_scores',
+    'message': 'Missing one of mood, energy, sleep, stress'
+})
+_ERR_ROTATING_KEYS = to_json_bytes({
+    'success': False,
+    'error': 'Invalid rotating_scores',
+    'message': 'domain_name and scores are required'
+})
+_ERR_ROTATING_SHAPE = to_json_bytes({
+    'success': False,
+    'error': 'Invalid rotating_scores',
+    'message': 'scores must be a list of 5 integers'
+})
+_ERR_DASS_KEYS = to_json_bytes({
+    'success': False,
+    'error': 'Invalid dass_today',
+    'message': 'Missing one of depression, anxiety, stress'
+})
+_ERR_CORE_RANGE = to_json_bytes({
+    'success': False,
+    'error': 'Invalid core_scores',
+    'message': 'All core scores must be integers between 1 and 5'
+})
+_ERR_ROTATING_RANGE = to_json_bytes({
+    'success': False,
+    'error': 'Invalid rotating_scores',
+    'message': 'All rotating scores must be integers between 1 and 5'
+})
+_ERR_DASS_RANGE = to_json_bytes({
+    'success': False,
+    'error': 'Invalid dass_today',
+    'message': 'All DASS scores must be integers between 1 and 5'
+})
+_ERR_SAVE_FAILED = to_json_bytes({
+    'success': False,
+    'error': 'Database error',
+    'message': 'Failed to save daily mood log'
+})
+
+
+
+
+def _valid_scores(scores) -> bool:
+    """True if every score is an int from 1 to 5 (bools are not accepted as integers)."""
+    return all(type(s) is int and 1 <= s <= 5 for s in scores)
 
 
 # ******************************************************************************
@@ -39,9 +109,10 @@ def submit_daily_quiz(user_id):
       { success, log_id, high_point, low_point, maybe weekly_dass if computed }
     """
     try:
-        payload = request.get_json()
-        if not payload:
-            return jsonify({'success': False, 'error': 'Invalid request', 'message': 'JSON body required'}), 400
+        # Parsed by the app's orjson provider; malformed JSON yields None
+        payload = request.get_json(cache=False, silent=True)
+        if not payload or not isinstance(payload, dict):
+            return json_bytes_response(_ERR_JSON_REQUIRED, 400)
 
         # Validate required sections
         core = payload.get('core_scores')
@@ -49,104 +120,79 @@ def submit_daily_quiz(user_id):
         dass = payload.get('dass_today')
 
         if not core or not rotating or not dass:
-            return jsonify({
-                'success': False,
-                'error': 'Missing required fields',
-                'message': 'core_scores, rotating_scores, and dass_today are required'
-            }), 400
-
-        # Validate core scores
-        required_core_keys = ['mood', 'energy', 'sleep', 'stress']
-        if any(k not in core for k in required_core_keys):
-            return jsonify({'success': False, 'error': 'Invalid core_scores', 'message': 'Missing one of mood, energy, sleep, stress'}), 400
-        core_scores = [core['mood'], core['energy'], core['sleep'], core['stress']]
-        if not all(isinstance(s, int) and 1 <= s <= 5 for s in core_scores):
-            return jsonify({'success': False, 'error': 'Invalid core_scores', 'message': 'All core scores must be integers between 1 and 5'}), 400
-
-        # Validate rotating scores
-        if 'domain_name' not in rotating or 'scores' not in rotating:
-            return jsonify({'success': False, 'error': 'Invalid rotating_scores', 'message': 'domain_name and scores are required'}), 400
-        if not isinstance(rotating['scores'], list) or len(rotating['scores']) != 5:
-            return jsonify({'success': False, 'error': 'Invalid rotating_scores', 'message': 'scores must be a list of 5 integers'}), 400
+            return json_bytes_response(_ERR_MISSING_SECTIONS, 400)
+
+        # Validate each section in turn: keys, then score range
+        if not isinstance(core, dict) or _REQUIRED_CORE_KEYS - core.keys():
+            return json_bytes_response(_ERR_CORE_KEYS, 400)
+        core_scores = [core[k] for k in CORE_KEYS]
+        if not _valid_scores(core_scores):
+            return json_bytes_response(_ERR_CORE_RANGE, 400)
+
+        if not isinstance(rotating, dict) or 'domain_name' not in rotating or 'scores' not in rotating:
+            return json_bytes_response(_ERR_ROTATING_KEYS, 400)
         rotating_scores = rotating['scores']
-        if not all(isinstance(s, int) and 1 <= s <= 5 for s in rotating_scores):
-            return jsonify({'success': False, 'error': 'Invalid rotating_scores', 'message': 'All rotating scores must be integers between 1 and 5'}), 400
+        if not isinstance(rotating_scores, list) or len(rotating_scores) != ROTATING_SCORE_COUNT:
+            return json_bytes_response(_ERR_ROTATING_SHAPE, 400)
+        if not _valid_scores(rotating_scores):
+            return json_bytes_response(_ERR_ROTATING_RANGE, 400)
 
-        # Validate DASS today
-        required_dass_keys = ['depression', 'anxiety', 'stress']
-        if any(k not in dass for k in required_dass_keys):
-            return jsonify({'success': False, 'error': 'Invalid dass_today', 'message': 'Missing one of depression, anxiety, stress'}), 400
-        dass_scores = [dass['depression'], dass['anxiety'], dass['stress']]
-        if not all(isinstance(s, int) and 1 <= s <= 5 for s in dass_scores):
-            return jsonify({'success': False, 'error': 'Invalid dass_today', 'message': 'All DASS scores must be integers between 1 and 5'}), 400
+        if not isinstance(dass, dict) or _REQUIRED_DASS_KEYS - dass.keys():
+            return json_bytes_response(_ERR_DASS_KEYS, 400)
+        dass_scores = [dass[k] for k in DASS_KEYS]
+        if not _valid_scores(dass_scores):
+            return json_bytes_response(_ERR_DASS_RANGE, 400)
 
         # Step 2 — Compute Daily Averages (1–5 scale)
         core_avg = sum(core_scores) / len(core_scores)
         rotating_avg = sum(rotating_scores) / len(rotating_scores)
 
         # Step 3 — Identify High & Low Points
-        all_scores = core_scores + rotating_scores + [dass['depression'], dass['anxiety'], dass['stress']]
+        all_scores = core_scores + rotating_scores + dass_scores
         all_questions = [
             'q1','q2','q3','q4',  # core
             'q5','q6','q7','q8','q9',  # rotating
             'q10','q11','q12'  # DASS
         ]
-        high_idx = all_scores.index(max(all_scores))
-        low_idx = all_scores.index(min(all_scores))
+        # Single pass; strict comparisons keep the first question on ties
+        high_idx = low_idx = 0
+        for i, score in enumerate(all_scores):
+            if score > all_scores[high_idx]:
+                high_idx = i
+            elif score < all_scores[low_idx]:
+                low_idx = i
         high_point = { 'question_id': all_questions[high_idx], 'score': all_scores[high_idx] }
         low_point = { 'question_id': all_questions[low_idx], 'score': all_scores[low_idx] }
 
         # Build Firestore document
         daily_doc = {
             'date': payload.get('date'),
-            'core_scores': {
-                'mood': core['mood'],
-                'energy': core['energy'],
-                'sleep': core['sleep'],
-                'stress': core['stress'],
-            },
-            'rotating_scores': {
-                'domain_name': rotating['domain_name'],
-                'scores': rotating_scores,
-            },
-            'dass_today': {
-                'depression': dass['depression'],
-                'anxiety': dass['anxiety'],
-                'stress': dass['stress'],
-            },
+            # Only the validated keys are stored, reusing the extracted scores
+            'core_scores': dict(zip(CORE_KEYS, core_scores)),
+            'rotating_scores': {'domain_name': rotating['domain_name'], 'scores': rotating_scores},
+            'dass_today': dict(zip(DASS_KEYS, dass_scores)),
             'high_point': high_point,
             'low_point': low_point,
             # Optionally include averages for analytics convenience
             'core_avg': core_avg,
             'rotating_avg': rotating_avg,
         }
-        if 'additional_notes' in payload and payload['additional_notes']:
-            daily_doc['additional_notes'] = payload['additional_notes']
+        additional_notes = payload.get('additional_notes')
+        if additional_notes:
+            daily_doc['additional_notes'] = additional_notes
 
         # Save daily log
         log_id = save_daily_mood_log(user_id, daily_doc)
         if not log_id:
-            return jsonify({'success': False, 'error': 'Database error', 'message': 'Failed to save daily mood log'}), 500
+            return json_bytes_response(_ERR_SAVE_FAILED, 500)
 
         # After saving, check if we have 7 logs to trigger weekly DASS aggregation
         weekly_result = None
         # Only trigger when total count is a multiple of 7 (i.e., end of a 7-day block)
         total_count = get_daily_mood_logs_count(user_id)
-        last_7 = get_last_daily_mood_logs(user_id, 7)
-        if total_count >= 7 and total_count % 7 == 0 and len(last_7) == 7:
-            # Extract DASS series
-            def _to_dass_scale(score: int) -> int:
-                mapping = {1:0, 2:1, 3:1, 4:2, 5:3}
-                return mapping[int(score)]
-
-            depression_vals = [entry.get('dass_today', {}).get('depression', 0) for entry in last_7]
-            anxiety_vals = [entry.get('dass_today', {}).get('anxiety', 0) for entry in last_7]
-            stress_vals = [entry.get('dass_today', {}).get('stress', 0) for entry in last_7]
-
-            depression_total = sum(_to_dass_scale(s) for s in depression_vals) * 2
-            anxiety_total = sum(_to_dass_scale(s) for s in anxiety_vals) * 2
-            stress_total = sum(_to_dass_scale(s) for s in stress_vals) * 2
-
+        # The last 7 logs are only needed at a block boundary, so skip the read otherwise
+        last_7 = get_last_daily_mood_logs(user_id, 7, _WEEKLY_FIELDS) if total_count >= 7 and total_count % 7 == 0 else []
+        if len(last_7) == 7:
             # Determine week range based on earliest/latest dates in the 7 logs
             # Prefer explicit 'date' field, else derive from submitted_at
             def _extract_date(entry):
@@ -162,7 +208,31 @@ def submit_daily_quiz(user_id):
                     pass
                 return None
 
-            dates = [d for d in (_extract_date(e) for e in last_7) if d]
+            # One pass over the 7 logs for DASS totals, dates, and daily averages
+            depression_total = anxiety_total = stress_total = 0
+            dates = []
+            core_avgs_per_day = []
+            rotating_avgs_per_day = []
+            for entry in last_7:
+                dt = entry.get('dass_today', {})
+                depression_total += _DASS_SCALE[dt.get('depression', 0)]
+                anxiety_total += _DASS_SCALE[dt.get('anxiety', 0)]
+                stress_total += _DASS_SCALE[dt.get('stress', 0)]
+
+                d = _extract_date(entry)
+                if d:
+                    dates.append(d)
+
+                c = entry.get('core_scores', {})
+                core_avgs_per_day.append((c.get('mood', 0) + c.get('energy', 0) + c.get('sleep', 0) + c.get('stress', 0)) / 4)
+                rs = entry.get('rotating_scores', {}).get('scores', [])
+                if isinstance(rs, list) and len(rs) == 5:
+                    rotating_avgs_per_day.append(sum(rs)/5)
+
+            depression_total *= 2
+            anxiety_total *= 2
+            stress_total *= 2
+
             if dates:
                 week_start = min(dates)
                 week_end = max(dates)
@@ -171,43 +241,31 @@ def submit_daily_quiz(user_id):
                 week_start = date.today().isoformat()
                 week_end = week_start
 
-            # Avoid duplicates: only save if a record for this range doesn't exist
-            if not weekly_dass_exists(user_id, week_start, week_end):
-                weekly_id = save_weekly_dass_totals(
-                    user_id,
-                    week_start,
-                    week_end,
-                    depression_total,
-                    anxiety_total,
-                    stress_total,
-                )
-                if weekly_id:
-                    # Compute optional weekly summary for response (not stored)
-                    core_avgs_per_day = []
-                    rotating_avgs_per_day = []
-                    for entry in last_7:
-                        c = entry.get('core_scores', {})
-                        r = entry.get('rotating_scores', {})
-                        cs = [c.get('mood', 0), c.get('energy', 0), c.get('sleep', 0), c.get('stress', 0)]
-                        rs = r.get('scores', [])
-                        if len(cs) == 4:
-                            core_avgs_per_day.append(sum(cs)/4)
-                        if isinstance(rs, list) and len(rs) == 5:
-                            rotating_avgs_per_day.append(sum(rs)/5)
-
-                    weekly_core_avg = round(sum(core_avgs_per_day)/len(core_avgs_per_day), 2) if core_avgs_per_day else None
-                    weekly_rotating_avg = round(sum(rotating_avgs_per_day)/len(rotating_avgs_per_day), 2) if rotating_avgs_per_day else None
-
-                    weekly_result = {
-                        'weekly_id': weekly_id,
-                        'week_start': week_start,
-                        'week_end': week_end,
-                        'depression_total': depression_total,
-                        'anxiety_total': anxiety_total,
-                        'stress_total': stress_total,
-                        'weekly_core_avg': weekly_core_avg,
-                        'weekly_rotating_avg': weekly_rotating_avg,
-                    }
+            # The weekly document ID is derived from the range, so a week that was
+            # already saved comes back as None and is not reported again
+            weekly_id = save_weekly_dass_totals(
+                user_id,
+                week_start,
+                week_end,
+                depression_total,
+                anxiety_total,
+                stress_total,
+            )
+            if weekly_id:
+                # Optional weekly summary for response (not stored)
+                weekly_core_avg = round(sum(core_avgs_per_day)/len(core_avgs_per_day), 2) if core_avgs_per_day else None
+                weekly_rotating_avg = round(sum(rotating_avgs_per_day)/len(rotating_avgs_per_day), 2) if rotating_avgs_per_day else None
+
+                weekly_result = {
+                    'weekly_id': weekly_id,
+                    'week_start': week_start,
+                    'week_end': week_end,
+                    'depression_total': depression_total,
+                    'anxiety_total': anxiety_total,
+                    'stress_total': stress_total,
+                    'weekly_core_avg': weekly_core_avg,
+                    'weekly_rotating_avg': weekly_rotating_avg,
+                }
 
         return jsonify({
             'success': True,
@@ -0,0 +1,39 @@
+"""orjson-backed JSON provider for request parsing and responses."""
+
+import orjson
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+
+# Datetimes go through Flask's default conversion so the wire format matches jsonify
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def to_json_bytes(obj) -> bytes:
+    """Serialize obj the same way OrjsonProvider does, for payloads built ahead of time."""
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=_ORJSON_OPTIONS)
+
+
+def json_bytes_response(body: bytes, status: int = 200):
+    """Wrap pre-serialized JSON bytes in a new response object."""
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes and decodes with orjson.
+
+    Types orjson doesn't serialize natively (dates, UUIDs, dataclasses, ...)
+    fall back to DefaultJSONProvider.default, so output stays compatible.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's UTF-8 bytes straight to the response, skipping a decode/encode round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(to_json_bytes(obj), mimetype=self.mimetype)
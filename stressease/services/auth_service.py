@@ -1,9 +1,44 @@
 """Auth helpers and @token_required decorator."""
 
 import functools
+import hashlib
+import logging
+import threading
+import time
+from cachetools import TTLCache
 from flask import request, jsonify, g
 import firebase_admin.auth
 
+
+logger = logging.getLogger(__name__)
+
+# Recently verified ID tokens -> decoded claims, so repeat requests with the
+# same token skip signature verification. Keys are a short digest of the
+# token rather than the raw JWT, and entries stop being used shortly
+# before the token's exp.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL_SECONDS = 300
+TOKEN_EXPIRY_MARGIN_SECONDS = 30
+_verified_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+_verified_tokens_lock = threading.Lock()
+
+
+def _verify_token(token):
+    """Verify a Firebase ID token, reusing a recent successful verification of the same token."""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _verified_tokens_lock:
+        decoded_token = _verified_tokens.get(key)
+    
+    if decoded_token is not None and decoded_token.get('exp', 0) - TOKEN_EXPIRY_MARGIN_SECONDS > time.time():
+        return decoded_token
+    
+    # Raises on invalid, expired or revoked tokens; failures are never cached
+    decoded_token = firebase_admin.auth.verify_id_token(token)
+    with _verified_tokens_lock:
+        _verified_tokens[key] = decoded_token
+    return decoded_token
+
+
 def token_required(f):
     """Verify Firebase ID token from Authorization: Bearer <token> and pass user_id to the route."""
     @functools.wraps(f)
@@ -31,7 +66,7 @@ def token_required(f):
         # Validate the Firebase JWT token
         try:
             # Verify the ID token and decode it
-            decoded_token = firebase_admin.auth.verify_id_token(token)
+            decoded_token = _verify_token(token)
             user_id = decoded_token['uid']
             
             # Store user_id in Flask's g object for access in other functions
@@ -56,8 +91,8 @@ def token_required(f):
                 'message': 'Token has been revoked'
             }), 401
         except Exception as e:
-            # Log the error for debugging (in production, use proper logging)
-            print(f"Token validation error: {str(e)}")
+            # Log the error for debugging
+            logger.warning("Token validation error: %s", e)
             return jsonify({
                 'error': 'Unauthorized',
                 'message': 'Token validation failed'
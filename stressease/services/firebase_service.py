@@ -1,11 +1,18 @@
 """Firestore helpers for users, mood logs, and crisis resources."""
 
+import hashlib
+import logging
+import threading
 import firebase_admin
 from firebase_admin import credentials, firestore
-from datetime import datetime, date
+from google.api_core.exceptions import AlreadyExists
+from cachetools import TTLCache
+from datetime import date
 from typing import Dict, List, Optional, Any, Union
 
 
+logger = logging.getLogger(__name__)
+
 # Global Firestore client
 db = None
 
@@ -13,6 +20,7 @@ db = None
 def init_firebase(credentials_path: str):
     """
     Initialize Firebase Admin SDK with service account credentials.
+    Safe to call more than once; the default app is only created the first time.
     
     Args:
         credentials_path (str): Path to the Firebase service account JSON file
@@ -23,17 +31,20 @@ def init_firebase(credentials_path: str):
     global db
     
     try:
-        # Initialize Firebase Admin SDK
-        cred = credentials.Certificate(credentials_path)
-        firebase_admin.initialize_app(cred)
+        # Initialize Firebase Admin SDK, reusing the default app if it exists
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            cred = credentials.Certificate(credentials_path)
+            firebase_admin.initialize_app(cred)
         
         # Get Firestore client
         db = firestore.client()
         
-        print("Firebase Admin SDK initialized successfully")
+        logger.info("Firebase Admin SDK initialized successfully")
         
     except Exception as e:
-        print(f"Failed to initialize Firebase: {str(e)}")
+        logger.error("Failed to initialize Firebase: %s", e)
         raise
 
 
@@ -71,46 +82,49 @@ def save_daily_mood_log(user_id: str, daily_log: Dict[str, Any]) -> Optional[str
     Returns:
         Optional[str]: Document ID if saved successfully, else None
     """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
+    client = get_firestore_client()
 
     try:
         daily_log['user_id'] = user_id
         # Default date if not provided
         if 'date' not in daily_log or not daily_log['date']:
             daily_log['date'] = date.today().isoformat()
-        # Server-side timestamp
-        daily_log['submitted_at'] = datetime.utcnow()
+        # Server-side timestamp, filled in by Firestore on write
+        daily_log['submitted_at'] = firestore.SERVER_TIMESTAMP
 
-        doc_ref = db.collection('user_mood_logs').add(daily_log)
+        doc_ref = client.collection('user_mood_logs').add(daily_log)
         return doc_ref[1].id
     except Exception as e:
-        print(f"Error saving daily mood log for {user_id}: {str(e)}")
+        logger.warning("Error saving daily mood log for %s: %s", user_id, e)
         return None
 
 
-def get_last_daily_mood_logs(user_id: str, limit: int = 7) -> List[Dict[str, Any]]:
+def get_last_daily_mood_logs(user_id: str, limit: int = 7,
+                             fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Retrieve the most recent daily mood quiz logs for a user.
 
     Args:
         user_id (str): Firebase Auth user ID
         limit (int): Number of entries to retrieve (default: 7)
+        fields (list): Field paths to return; all fields if omitted
 
     Returns:
         List[Dict[str, Any]]: List of daily mood logs (newest first)
     """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
+    client = get_firestore_client()
 
     try:
         logs = []
         query = (
-            db.collection('user_mood_logs')
+            client.collection('user_mood_logs')
               .where('user_id', '==', user_id)
               .order_by('submitted_at', direction=firestore.Query.DESCENDING)
               .limit(limit)
         )
+        if fields:
+            # Projection: Firestore only sends the requested fields
+            query = query.select(fields)
         docs = query.stream()
         for doc in docs:
             entry = doc.to_dict()
@@ -118,7 +132,7 @@ def get_last_daily_mood_logs(user_id: str, limit: int = 7) -> List[Dict[str, Any
             logs.append(entry)
         return logs
     except Exception as e:
-        print(f"Error retrieving last daily mood logs for {user_id}: {str(e)}")
+        logger.warning("Error retrieving last daily mood logs for %s: %s", user_id, e)
         return []
 
 
@@ -132,51 +146,18 @@ def get_daily_mood_logs_count(user_id: str) -> int:
     Returns:
         int: Total count of documents in user_mood_logs for the user
     """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
+    client = get_firestore_client()
 
     try:
-        query = db.collection('user_mood_logs').where('user_id', '==', user_id)
-        count = 0
-        for _ in query.stream():
-            count += 1
-        return count
+        query = client.collection('user_mood_logs').where('user_id', '==', user_id)
+        # Server-side COUNT aggregation; no documents are transferred
+        results = query.count().get()
+        return int(results[0][0].value)
     except Exception as e:
-        print(f"Error counting daily mood logs for {user_id}: {str(e)}")
+        logger.warning("Error counting daily mood logs for %s: %s", user_id, e)
         return 0
 
 
-def weekly_dass_exists(user_id: str, week_start: str, week_end: str) -> bool:
-    """
-    Check if a weekly DASS record already exists for the given user and week.
-
-    Args:
-        user_id (str): Firebase Auth user ID
-        week_start (str): ISO date string for week start
-        week_end (str): ISO date string for week end
-
-    Returns:
-        bool: True if a record exists, False otherwise
-    """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
-
-    try:
-        query = (
-            db.collection('user_weekly_dass')
-              .where('user_id', '==', user_id)
-              .where('week_start', '==', week_start)
-              .where('week_end', '==', week_end)
-        )
-        docs = query.stream()
-        for _ in docs:
-            return True
-        return False
-    except Exception as e:
-        print(f"Error checking weekly DASS existence for {user_id}: {str(e)}")
-        return False
-
-
 def save_weekly_dass_totals(user_id: str, week_start: str, week_end: str,
                              depression_total: int, anxiety_total: int, stress_total: int) -> Optional[str]:
     """
@@ -184,6 +165,14 @@ def save_weekly_dass_totals(user_id: str, week_start: str, week_end: str,
 
     Collection: user_weekly_dass
 
+    The document ID is a digest of the user and week range, so saving the
+    same week twice is rejected by Firestore instead of duplicating it. The
+    dates come from client-supplied logs, so they are hashed rather than
+    used in the ID directly (a '/' would change the document path).
+
+    Weeks saved before this scheme have auto-generated IDs and are not
+    matched; recomputing one of those ranges writes a second record.
+
     Args:
         user_id (str): Firebase Auth user ID
         week_start (str): ISO date string for week start
@@ -194,9 +183,9 @@ def save_weekly_dass_totals(user_id: str, week_start: str, week_end: str,
 
     Returns:
         Optional[str]: Document ID if saved successfully, else None
+        (including when this week was already saved)
     """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
+    client = get_firestore_client()
 
     try:
         data = {
@@ -206,20 +195,51 @@ def save_weekly_dass_totals(user_id: str, week_start: str, week_end: str,
             'depression_total': depression_total,
             'anxiety_total': anxiety_total,
             'stress_total': stress_total,
-            'calculated_at': datetime.utcnow(),
+            'calculated_at': firestore.SERVER_TIMESTAMP,
         }
 
-        doc_ref = db.collection('user_weekly_dass').add(data)
-        return doc_ref[1].id
+        doc_id = hashlib.sha256(f"{user_id}\0{week_start}\0{week_end}".encode()).hexdigest()
+        doc_ref = client.collection('user_weekly_dass').document(doc_id)
+        doc_ref.create(data)
+        return doc_ref.id
+    except AlreadyExists:
+        return None
     except Exception as e:
-        print(f"Error saving weekly DASS totals for {user_id}: {str(e)}")
+        logger.warning("Error saving weekly DASS totals for %s: %s", user_id, e)
         return None
 
 
+def normalize_country_id(country: str) -> str:
+    """
+    Canonical form of a country code or name, used as the crisis resources cache key.
+    Collapses whitespace, uppercases codes (e.g. ' us' -> 'US') and title-cases
+    names (e.g. 'united  STATES' -> 'United States').
+    
+    Args:
+        country (str): Country code or name as entered
+        
+    Returns:
+        str: Normalized country ID, or '' if the input is blank
+    """
+    country_id = ' '.join(country.split())
+    if len(country_id) <= 3:  # Likely a country code
+        return country_id.upper()
+    return country_id.title()  # Likely a country name
+
+
+# Process-local cache in front of the crisis_resources collection, keyed by
+# normalized country ID; only resources that were found are stored
+CRISIS_RESOURCES_CACHE_SIZE = 512
+CRISIS_RESOURCES_TTL_SECONDS = 6 * 60 * 60
+_crisis_resources_cache = TTLCache(maxsize=CRISIS_RESOURCES_CACHE_SIZE, ttl=CRISIS_RESOURCES_TTL_SECONDS)
+_crisis_resources_lock = threading.Lock()
+
+
 def get_cached_crisis_resources(country: str) -> Optional[Dict[str, Any]]:
     """
     Get cached crisis resources for a specific country.
     Works with both country codes (e.g., 'US') and country names (e.g., 'United States').
+    Checks the in-process cache before reading Firestore.
     
     Args:
         country (str): Country code or name to get resources for
@@ -227,39 +247,40 @@ def get_cached_crisis_resources(country: str) -> Optional[Dict[str, Any]]:
     Returns:
         dict: Crisis resources data, or None if not found in cache
     """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
+    client = get_firestore_client()
     
     if not country or not country.strip():
-        print("Warning: Attempted to get cached crisis resources with an empty country parameter.")
+        logger.warning("Attempted to get cached crisis resources with an empty country parameter.")
         return None
 
     try:
         # Normalize country input (uppercase for codes, title case for names)
-        country_id = country.strip()
-        if len(country_id) <= 3:  # Likely a country code
-            country_id = country_id.upper()
-        else:  # Likely a country name
-            country_id = country_id.title()
+        country_id = normalize_country_id(country)
+        
+        with _crisis_resources_lock:
+            resources = _crisis_resources_cache.get(country_id)
+        if resources is not None:
+            return resources
         
         # Try to get document with country code/name as ID
-        doc_ref = db.collection('crisis_resources').document(country_id)
+        doc_ref = client.collection('crisis_resources').document(country_id)
         doc = doc_ref.get()
         
         if doc.exists:
-            return doc.to_dict()
+            resources = doc.to_dict()
+        elif len(country_id) > 3:
+            # If not found by exact match and it's a country name, try to find by country field
+            query = client.collection('crisis_resources').where('country', '==', country_id).limit(1)
+            for doc in query.stream():
+                resources = doc.to_dict()
         
-        # If not found by exact match and it's a country name, try to find by country field
-        if len(country_id) > 3:
-            query = db.collection('crisis_resources').where('country', '==', country_id)
-            docs = query.stream()
-            for doc in docs:
-                return doc.to_dict()
-        
-        return None
+        if resources:
+            with _crisis_resources_lock:
+                _crisis_resources_cache[country_id] = resources
+        return resources
             
     except Exception as e:
-        print(f"Error getting cached crisis resources for {country}: {str(e)}")
+        logger.warning("Error getting cached crisis resources for %s: %s", country, e)
         return None
 
 
@@ -274,29 +295,33 @@ def cache_crisis_resources(country: str, resources: Dict[str, Any]) -> bool:
     Returns:
         bool: True if successful, False otherwise
     """
-    if db is None:
-        raise RuntimeError("Firebase has not been initialized. Call init_firebase() first.")
+    client = get_firestore_client()
     
     if not country or not country.strip():
-        print("Warning: Attempted to cache crisis resources with an empty country parameter.")
+        logger.warning("Attempted to cache crisis resources with an empty country parameter.")
         return False
 
     try:
         # Normalize country input (uppercase for codes, title case for names)
-        country_id = country.strip()
-        if len(country_id) <= 3:  # Likely a country code
-            country_id = country_id.upper()
-        else:  # Likely a country name
-            country_id = country_id.title()
+        country_id = normalize_country_id(country)
         
         # Add country field to resources for querying
         resources['country'] = country_id
-        resources['cached_at'] = datetime.utcnow()
         
-        # Save to crisis_resources collection with country as document ID
-        db.collection('crisis_resources').document(country_id).set(resources)
+        # Save to crisis_resources collection with country as document ID.
+        # The server timestamp sentinel only goes into the written copy, since
+        # resources is also returned to the client and cached in memory; those
+        # get the write's commit time, which is the value Firestore stored.
+        write_result = client.collection('crisis_resources').document(country_id).set(
+            {**resources, 'cached_at': firestore.SERVER_TIMESTAMP}
+        )
+        resources['cached_at'] = write_result.update_time
+        
+        # Keep the in-process cache in step with what was just written
+        with _crisis_resources_lock:
+            _crisis_resources_cache[country_id] = resources
         return True
         
     except Exception as e:
-        print(f"Error caching crisis resources for {country}: {str(e)}")
+        logger.warning("Error caching crisis resources for %s: %s", country, e)
         return False
\ No newline at end of file
@@ -1,15 +1,25 @@
 """Gemini helpers: mood analysis, chat replies, and conversation summaries."""
 
 import google.generativeai as genai
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Any
 import json
+import logging
+import re
 
 
+logger = logging.getLogger(__name__)
+
 # Global Gemini model
 model = None
 
-# Global in-memory session cache for active conversations
-active_chat_sessions = {}
+# Bounded pool for Gemini chat calls: caps in-flight upstream requests
+# independently of the WSGI thread count and lets a request stop waiting
+# on a stalled reply
+CHAT_MAX_CONCURRENCY = 16
+CHAT_RESPONSE_TIMEOUT_SECONDS = 30
+CHAT_CONNECTION_FALLBACK = "I'm having trouble connecting right now. Could we try again in a moment?"
+_chat_executor = ThreadPoolExecutor(max_workers=CHAT_MAX_CONCURRENCY, thread_name_prefix='gemini-chat')
 
 #------------------------------------------------------------------------------
 # Initialization and Utility Functions
@@ -26,10 +36,10 @@ def init_gemini(api_key: str):
         # Initialize the model 
         model = genai.GenerativeModel('gemini-2.0-flash-lite')
         
-        print("Google Gemini AI initialized successfully")
+        logger.info("Google Gemini AI initialized successfully")
         
     except Exception as e:
-        print(f"Failed to initialize Gemini AI: {str(e)}")
+        logger.error("Failed to initialize Gemini AI: %s", e)
         raise
 
 
@@ -40,6 +50,50 @@ def get_gemini_model():
     return model
 
 
+#------------------------------------------------------------------------------
+# Response Safety Patterns
+#------------------------------------------------------------------------------
+
+# Crisis-related content in AI responses
+CRISIS_KEYWORDS = ['suicide', 'self-harm', 'kill yourself', 'end it all', 'hurt myself', 'die']
+
+# Diagnosis language violations
+DIAGNOSIS_PATTERNS = [
+    'you have ', 'you are suffering from', 'you might have', 'you probably have',
+    'sounds like you have', 'diagnosis', 'diagnose', 'condition is', 'disorder',
+    'i diagnose', 'you exhibit symptoms of', 'clinical depression', 'clinical anxiety',
+    'you are experiencing', 'you are exhibiting', 'pathological', 'psychiatric condition'
+]
+
+# Medication/treatment advice
+MEDICATION_PATTERNS = [
+    'you should take', 'you need to take', 'prescribe', 'medication', 'dosage',
+    'you should try', 'treatment plan', 'medical treatment', 'therapy regimen'
+]
+
+
+def _alternation(phrases: List[str]) -> str:
+    """Join literal phrases into a regex alternation."""
+    return '|'.join(re.escape(phrase) for phrase in phrases)
+
+
+# One scan over the response for all three categories, reported through the
+# named group that matched. The whole alternation sits in a zero-width
+# lookahead so phrases that overlap (e.g. 'diagnose' + 'self-harm') are each
+# still seen; at a shared start position the higher-priority category wins.
+_SAFETY_RE = re.compile(
+    '(?='
+    f'(?P<crisis>{_alternation(CRISIS_KEYWORDS)})'
+    f'|(?P<diagnosis>{_alternation(DIAGNOSIS_PATTERNS)})'
+    f'|(?P<medication>{_alternation(MEDICATION_PATTERNS)})'
+    ')',
+    re.IGNORECASE
+)
+
+# Outermost {...} block in a Gemini reply that wraps JSON in extra text
+_JSON_OBJECT_RE = re.compile(r'({[\s\S]*})')
+
+
 def validate_gemini_response(response: str) -> Optional[str]:
     """
     Validate that a Gemini response is appropriate and safe.
@@ -48,35 +102,24 @@ def validate_gemini_response(response: str) -> Optional[str]:
     if not response or len(response.strip()) == 0:
         return None
     
-    response_lower = response.lower()
+    # Collect the categories present; crisis outranks everything, so stop there
+    categories = set()
+    for match in _SAFETY_RE.finditer(response):
+        categories.add(match.lastgroup)
+        if match.lastgroup == 'crisis':
+            break
     
     # Check for crisis-related content in AI response
-    crisis_keywords = ['suicide', 'self-harm', 'kill yourself', 'end it all', 'hurt myself', 'die']
-    for keyword in crisis_keywords:
-        if keyword in response_lower:
-            return """I notice this is a serious topic. If you're experiencing a Crisis, please tap the red 'SOS' button in the chat to connect with professional Crisis resources immediately. How can I support you right now?"""
+    if 'crisis' in categories:
+        return """I notice this is a serious topic. If you're experiencing a Crisis, please tap the red 'SOS' button in the chat to connect with professional Crisis resources immediately. How can I support you right now?"""
     
     # Check for diagnosis language violations
-    diagnosis_patterns = [
-        'you have ', 'you are suffering from', 'you might have', 'you probably have',
-        'sounds like you have', 'diagnosis', 'diagnose', 'condition is', 'disorder',
-        'i diagnose', 'you exhibit symptoms of', 'clinical depression', 'clinical anxiety',
-        'you are experiencing', 'you are exhibiting', 'pathological', 'psychiatric condition'
-    ]
-    
-    for pattern in diagnosis_patterns:
-        if pattern in response_lower:
-            return """I'm here to listen and support you, but I can't provide medical diagnoses or clinical advice. Consider discussing your feelings with a healthcare professional who can provide personalized guidance. How else can I support you today?"""
+    if 'diagnosis' in categories:
+        return """I'm here to listen and support you, but I can't provide medical diagnoses or clinical advice. Consider discussing your feelings with a healthcare professional who can provide personalized guidance. How else can I support you today?"""
     
     # Check for medication/treatment advice
-    medication_patterns = [
-        'you should take', 'you need to take', 'prescribe', 'medication', 'dosage',
-        'you should try', 'treatment plan', 'medical treatment', 'therapy regimen'
-    ]
-    
-    for pattern in medication_patterns:
-        if pattern in response_lower:
-            return """I'm here to provide emotional support, but I can't recommend specific treatments or medications. A healthcare professional would be the best person to discuss treatment options with you. Is there something else on your mind that you'd like to talk about?"""
+    if 'medication' in categories:
+        return """I'm here to provide emotional support, but I can't recommend specific treatments or medications. A healthcare professional would be the best person to discuss treatment options with you. Is there something else on your mind that you'd like to talk about?"""
     
     return response
 
@@ -139,27 +182,26 @@ Ensure all phone numbers include the country code. Provide accurate, up-to-date
             resources = json.loads(response_text)
         except json.JSONDecodeError:
             # If that fails, try to extract JSON using regex
-            import re
-            json_match = re.search(r'({[\s\S]*})', response_text)
+            json_match = _JSON_OBJECT_RE.search(response_text)
             if not json_match:
-                print(f"Error: No JSON found in Gemini response for country {country}")
+                logger.warning("No JSON found in Gemini response for country %s", country)
                 return None
                 
             try:
                 json_str = json_match.group(1)
                 resources = json.loads(json_str)
             except (json.JSONDecodeError, IndexError) as e:
-                print(f"Error: Failed to parse extracted JSON for country {country}: {str(e)}")
+                logger.warning("Failed to parse extracted JSON for country %s: %s", country, e)
                 return None
         
         # Validate the structure
         if not isinstance(resources, dict):
-            print(f"Error: Gemini response is not a dictionary for country {country}")
+            logger.warning("Gemini response is not a dictionary for country %s", country)
             return None
             
         # Ensure required fields are present
         if 'emergency_services' not in resources or 'crisis_hotlines' not in resources or 'online_resources' not in resources:
-            print(f"Error: Missing required fields in Gemini response for country {country}")
+            logger.warning("Missing required fields in Gemini response for country %s", country)
             return None
         
         # Clean up website URLs - remove backticks and markdown formatting
@@ -178,7 +220,7 @@ Ensure all phone numbers include the country code. Provide accurate, up-to-date
         return resources
         
     except Exception as e:
-        print(f"Error generating crisis resources for {country}: {str(e)}")
+        logger.warning("Error generating crisis resources for %s: %s", country, e)
         return None
 
 
@@ -280,24 +322,44 @@ Use the following user context to personalize your responses appropriately, but
         return chat_session
         
     except Exception as e:
-        print(f"Error starting chat session: {str(e)}")
+        logger.warning("Error starting chat session: %s", e)
         raise
 
 
-def generate_chat_response(chat_session, new_message: str) -> Optional[str]:
+def generate_chat_response(chat_session, new_message: str,
+                           on_timeout: Optional[Callable[[], None]] = None) -> Optional[str]:
     """
     Handle subsequent messages in an existing stateful conversation.
     
+    If the reply doesn't arrive in time and the call has already started, it
+    keeps running in the pool and will still append its turn to the session
+    history, so the session must not be reused; on_timeout is called to let
+    the caller discard it. A call that was still queued is simply dropped.
+    
     Args:
         chat_session: The active ChatSession object from the cache
         new_message: The user's new message text
+        on_timeout: Called when a timed-out call could not be cancelled
     
     Returns:
         The AI's response text or None if error occurs
     """
     try:
         # Send message to the stateful chat session and get response
-        response = chat_session.send_message(new_message)
+        future = _chat_executor.submit(chat_session.send_message, new_message)
+        try:
+            response = future.result(timeout=CHAT_RESPONSE_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # A call still queued behind other requests is dropped and never
+            # touches the history; one already in flight can't be stopped
+            in_flight = not future.cancel()
+            logger.warning(
+                "Gemini chat response timed out after %ss (%s)",
+                CHAT_RESPONSE_TIMEOUT_SECONDS, 'in flight' if in_flight else 'queued, cancelled'
+            )
+            if in_flight and on_timeout is not None:
+                on_timeout()
+            return CHAT_CONNECTION_FALLBACK
         
         # Validate the response for safety and appropriateness
         raw_response = response.text.strip()
@@ -310,8 +372,8 @@ def generate_chat_response(chat_session, new_message: str) -> Optional[str]:
         return validated_response
         
     except Exception as e:
-        print(f"Error generating chat response with Gemini: {str(e)}")
-        return "I'm having trouble connecting right now. Could we try again in a moment?"
+        logger.warning("Error generating chat response with Gemini: %s", e)
+        return CHAT_CONNECTION_FALLBACK
 
 
 #------------------------------------------------------------------------------
@@ -333,7 +395,7 @@ def analyze_mood_from_quiz(quiz_answers: Dict[str, Any], user_context: Optional[
         return analysis_result
         
     except Exception as e:
-        print(f"Error analyzing mood with Gemini: {str(e)}")
+        logger.warning("Error analyzing mood with Gemini: %s", e)
         return None
 
 
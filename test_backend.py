@@ -1,4 +1,4 @@
-"""Basic checks for imports, config, API modules, and app creation."""
+"""Basic checks for imports, config, API modules, app creation, and core validation."""
 
 import sys
 import os
@@ -181,6 +181,160 @@ def test_services_structure():
         return False
 
 
+def test_safety_filter():
+    """Test Gemini response safety filtering."""
+    print("\nTesting safety filter...")
+
+    try:
+        from stressease.services.gemini_service import validate_gemini_response
+
+        crisis = validate_gemini_response("If you want to hurt myself, ...")
+        diagnosis = validate_gemini_response("It sounds like you have depression.")
+        medication = validate_gemini_response("Your dosage could be adjusted.")
+
+        cases = [
+            # Clean text passes through, empty text is rejected
+            ("clean text unchanged", "Let's take a slow breath together.", "Let's take a slow breath together."),
+            ("empty text", "   ", None),
+            # Crisis outranks diagnosis, which outranks medication
+            ("crisis over diagnosis and medication", "You have anxiety; dosage aside, don't hurt myself.", crisis),
+            ("diagnosis over medication", "You might have depression, so check the dosage.", diagnosis),
+            # Phrases that share text are all detected
+            ("overlapping phrases", "diagnose-self-harm", crisis),
+            # Matching ignores case
+            ("uppercase crisis", "SUICIDE", crisis),
+            ("uppercase medication", "DOSAGE", medication),
+        ]
+
+        ok = crisis is not None and len({crisis, diagnosis, medication}) == 3
+        for name, text, expected in cases:
+            if validate_gemini_response(text) == expected:
+                print(f"✓ {name}")
+            else:
+                print(f"✗ {name}")
+                ok = False
+
+        return ok
+
+    except Exception as e:
+        print(f"✗ Safety filter error: {e}")
+        return False
+
+
+def test_daily_quiz_validation():
+    """Test that the daily quiz reports the first invalid section."""
+    print("\nTesting daily quiz validation...")
+
+    try:
+        from flask import Flask
+        from stressease.api import mood
+
+        app = Flask(__name__)
+        # Call the view without the token check
+        submit = mood.submit_daily_quiz.__wrapped__
+
+        valid = {
+            'core_scores': {'mood': 3, 'energy': 3, 'sleep': 3, 'stress': 3},
+            'rotating_scores': {'domain_name': 'social', 'scores': [3, 3, 3, 3, 3]},
+            'dass_today': {'depression': 3, 'anxiety': 3, 'stress': 3},
+        }
+
+        cases = [
+            # Sections are checked in order, keys then range, so an
+            # out-of-range core score is reported before a missing DASS key
+            ("core range before dass keys",
+             {**valid, 'core_scores': {**valid['core_scores'], 'mood': 9},
+              'dass_today': {'depression': 3, 'stress': 3}},
+             mood._ERR_CORE_RANGE),
+            ("rotating shape before dass range",
+             {**valid, 'rotating_scores': {'domain_name': 'social', 'scores': [3, 3]},
+              'dass_today': {**valid['dass_today'], 'anxiety': 0}},
+             mood._ERR_ROTATING_SHAPE),
+            ("booleans are not scores",
+             {**valid, 'dass_today': {**valid['dass_today'], 'stress': True}},
+             mood._ERR_DASS_RANGE),
+        ]
+
+        ok = True
+        for name, payload, expected in cases:
+            with app.test_request_context(json=payload):
+                response = submit('test-user')
+            if response.status_code == 400 and response.get_data() == expected:
+                print(f"✓ {name}")
+            else:
+                print(f"✗ {name}")
+                ok = False
+
+        return ok
+
+    except Exception as e:
+        print(f"✗ Daily quiz validation error: {e}")
+        return False
+
+
+def test_weekly_dass_dedup():
+    """Test that saving the same DASS week twice keeps one record."""
+    print("\nTesting weekly DASS deduplication...")
+
+    try:
+        from google.api_core.exceptions import AlreadyExists
+        import stressease.services.firebase_service as firebase_service
+
+        # Minimal Firestore stand-in whose create() rejects existing IDs
+        class FakeDocument:
+            def __init__(self, store, doc_id):
+                self.store = store
+                self.id = doc_id
+
+            def create(self, data):
+                if self.id in self.store:
+                    raise AlreadyExists(f"Document already exists: {self.id}")
+                self.store[self.id] = data
+
+        class FakeCollection:
+            def __init__(self, store):
+                self.store = store
+
+            def document(self, doc_id):
+                return FakeDocument(self.store, doc_id)
+
+        class FakeClient:
+            def __init__(self):
+                self.store = {}
+
+            def collection(self, name):
+                return FakeCollection(self.store)
+
+        original_db = firebase_service.db
+        firebase_service.db = FakeClient()
+        try:
+            week = ('test-user', '2024-01-01', '2024-01-07', 10, 12, 14)
+            first = firebase_service.save_weekly_dass_totals(*week)
+            second = firebase_service.save_weekly_dass_totals(*week)
+            stored = len(firebase_service.db.store)
+        finally:
+            firebase_service.db = original_db
+
+        ok = True
+        if first is not None and stored == 1:
+            print("✓ first save returns a document ID")
+        else:
+            print("✗ first save did not store the week")
+            ok = False
+
+        if second is None:
+            print("✓ repeat save returns None")
+        else:
+            print("✗ repeat save returned a document ID")
+            ok = False
+
+        return ok
+
+    except Exception as e:
+        print(f"✗ Weekly DASS deduplication error: {e}")
+        return False
+
+
 def main():
     """Run all tests."""
     print("StressEase Backend Test Suite")
@@ -191,7 +345,10 @@ def main():
         test_config,
         test_api_structure,
         test_services_structure,
-        test_app_creation
+        test_app_creation,
+        test_safety_filter,
+        test_daily_quiz_validation,
+        test_weekly_dass_dedup
     ]
     
     passed = 0